@@ -1,79 +1,172 @@
 """Interact with apt-get on Debian distros."""
 import logging
+import mmap
 import os
+import shlex
 import shutil
+import time
 
 from provision.utils import run
 
 LOG = logging.getLogger(__name__)
+HOME = os.path.expanduser("~")
 
 
 CACHE_UPDATED = False
+PKG_CACHE = None
+APT_LISTS = "/var/lib/apt/lists"
+TTL = 3600
+APT_ENV = {
+    "DEBIAN_FRONTEND": "noninteractive",
+    "APT_LISTCHANGES_FRONTEND": "none",
+    "LC_ALL": "C",
+}
+# Keep apt/dpkg from redrawing progress bars, which is slow on busy terminals
+APT_OPTS = "-q -o Dpkg::Use-Pty=0 -o Dpkg::Progress-Fancy=0 -o quiet::NoUpdate=true"
 
 
-def _update_cache() -> None:
+def _apt(*steps: str, **kwargs):
+    """Run apt commands chained with `&&` in a single sudo shell."""
+    cmd = ["sudo", "-E", "sh", "-c", " && ".join(steps)]
+    LOG.debug("Command: %s", cmd)
+    return run(cmd, env={**os.environ, **APT_ENV}, **kwargs)
+
+
+def _quiet() -> bool:
+    """Discard apt output unless logging at INFO or more verbose."""
+    return not LOG.isEnabledFor(logging.INFO)
+
+
+def _ttl() -> int:
+    """Return apt lists TTL from `PROVISION_APT_TTL`, or the default `TTL`."""
+    value = os.environ.get("PROVISION_APT_TTL")
+    if value is None:
+        return TTL
+    try:
+        return int(value)
+    except ValueError:
+        LOG.warning("Invalid PROVISION_APT_TTL %r; using %ds", value, TTL)
+        return TTL
+
+
+def _cache_is_fresh() -> bool:
+    """Check if apt lists were refreshed within the TTL."""
     global CACHE_UPDATED
     if not CACHE_UPDATED:
-        cmd = "sudo apt update -y"
-        LOG.debug("Command: %s", cmd)
-        run(cmd)
-        CACHE_UPDATED = True
+        try:
+            age = time.time() - os.stat(APT_LISTS).st_mtime
+        except FileNotFoundError:
+            return False
+        ttl = _ttl()
+        LOG.debug("Apt lists age: %ds (TTL: %ds)", age, ttl)
+        CACHE_UPDATED = age < ttl
+    return CACHE_UPDATED
+
+
+def _update_cache() -> None:
+    global CACHE_UPDATED
+    if not _cache_is_fresh():
+        # Touch the lists dir so its mtime records when we last updated
+        cmd = _apt("apt-get -qq update", f"touch {APT_LISTS}", quiet=_quiet())
+        if cmd.returncode == 0:
+            CACHE_UPDATED = True
+
+
+def _package_cache():
+    """Return python-apt package cache, or None if python-apt isn't installed."""
+    global PKG_CACHE
+    if PKG_CACHE is None:
+        try:
+            import apt as python_apt
+        except ImportError:
+            LOG.debug("python-apt not available")
+            return None
+        PKG_CACHE = python_apt.Cache()
+    return PKG_CACHE
 
 
-def _list_upgradable(args) -> int:
+def list_upgradable(args=None) -> int:
+    """List packages that have upgrades available."""
     LOG.debug("Apt cache updated: %s", CACHE_UPDATED)
     _update_cache()
-    cmd = run("apt list --upgradable", capture_output=True)
-    print(cmd.stdout)
-    return cmd.returncode
+    cache = _package_cache()
+    if cache is not None:
+        for pkg in cache:
+            if pkg.is_upgradable:
+                print(f"{pkg.name}/{pkg.candidate.version}")
+        return 0
+    return run(["apt", "list", "--upgradable"]).returncode
 
 
-def _upgrade(args=None) -> int:
-    _update_cache()
-    cmd = run("sudo apt full-upgrade -y", capture_output=True)
-    print(cmd.stdout)
-    return cmd.returncode
+def _installed_packages() -> set:
+    """Return names of packages dpkg reports as installed."""
+    cmd = run(
+        ["dpkg-query", "-W", "-f=${db:Status-Abbrev}${Package}\n"],
+        capture_output=True,
+    )
+    return {line[3:] for line in cmd.stdout.splitlines() if line.startswith("ii")}
 
 
-def install(args=None, pkgs: list = []) -> int:
+def install(args=None, pkgs: list = [], recommends: bool = True) -> int:
     """Install apt packages, skipping if already installed."""
-    _update_cache()
     # TODO: take cli args and add to pkg list if successful
     if not shutil.which("apt-get"):
         LOG.error("Apt not installed on this system")
         return 1
-    try:
-        packages = pkgs + args.packages
-    except AttributeError:
-        packages = pkgs
+    packages = pkgs + getattr(args, "packages", [])
     if not len(packages):
         LOG.info("No pkgs supplied; getting apt pkgs from disk")
-        pkg_file = "~/.config/shell/provision/apt_package"
+        pkg_file = f"{HOME}/.config/shell/provision/apt_package"
         try:
-            with open(os.path.expanduser(pkg_file), "r") as f:
-                packages = f.read().splitlines()
+            with open(pkg_file, "rb") as f:
+                # mmap can't map an empty file
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        lines = (line.strip() for line in iter(data.readline, b""))
+                        packages = [
+                            line.decode()
+                            for line in lines
+                            if line and not line.startswith(b"#")
+                        ]
         except FileNotFoundError:
             LOG.warning("apt pkg file not found at %s", pkg_file)
             return 1
-    cmd = ["sudo", "apt", "install", "-y", *packages]
-    LOG.debug("Command: %s", cmd)
-    try:
-        run(cmd)
-    except FileNotFoundError:
-        LOG.error("apt does not seem to be installed on this system.")
-        return 1
-    return 0
+    installed = _installed_packages()
+    packages = [p for p in packages if p not in installed]
+    if not packages:
+        LOG.info("All apt pkgs already installed")
+        return 0
+    # Prime sudo credentials once for the apt calls below
+    run(["sudo", "-v"])
+    _update_cache()
+    # Parallel installs may contend for the dpkg lock; wait instead of failing
+    # Keep existing config files instead of prompting about them
+    opts = f"{APT_OPTS} -o DPkg::Lock::Timeout=600 -o Dpkg::Options::=--force-confold"
+    if not recommends:
+        opts += " --no-install-recommends"
+    cmd = _apt(f"apt-get {opts} -y install {' '.join(map(shlex.quote, packages))}")
+    return cmd.returncode
 
 
 def update(args) -> int:
     """Install/update apt packages, and purge old cached files."""
-    _update_cache()
-    print("Listing upgradable packages...")
-    _list_upgradable
-    print("Upgrading packages...")
-    _upgrade(args)
-    #  install(args)
-    print("Cleaning up...")
-    run("sudo apt autoremove -y", check=True)
-    run("sudo apt purge -y", check=True)
-    return 0
+    global CACHE_UPDATED
+    if not shutil.which("apt-get"):
+        LOG.error("Apt not installed on this system")
+        return 1
+    run(["sudo", "-v"])
+    packages = getattr(args, "packages", [])
+    # Show-Upgraded prints the upgrade plan as part of the same run
+    steps = [f"apt-get {APT_OPTS} -o APT::Get::Show-Upgraded=true -y full-upgrade"]
+    if not _cache_is_fresh():
+        steps[:0] = ["apt-get -qq update", f"touch {APT_LISTS}"]
+    if packages:
+        steps.append(
+            f"apt-get {APT_OPTS} -y install {' '.join(map(shlex.quote, packages))}"
+        )
+    steps += [f"apt-get {APT_OPTS} -y autoremove", f"apt-get {APT_OPTS} -y purge"]
+    print("Updating, upgrading and cleaning up packages...")
+    cmd = _apt(*steps)
+    if cmd.returncode == 0:
+        CACHE_UPDATED = True
+    return cmd.returncode
@@ -1,5 +1,6 @@
 """Build argument parser for module."""
 import argparse
+import io
 import os
 import sys
 from typing import NoReturn
@@ -12,42 +13,47 @@ class ColoredArgParser(argparse.ArgumentParser):
 
     # RED : Error, GREEN : Okay, YELLOW : Warning, Blue: Help/Info
     color_dict = {"RED": "1;31", "GREEN": "1;32", "YELLOW": "1;33", "BLUE": "1;36"}
+    # \x1b[ is the ANSI Control Sequence Introducer (CSI)
+    _ansi = {name: (f"\x1b[{code}m", "\x1b[0m\n") for name, code in color_dict.items()}
 
     def print_usage(self, file=None) -> None:
         """Add color to `Usage` messages."""
         if file is None:
             file = sys.stdout
-        self._print_message(
-            self.format_usage()[0].upper() + self.format_usage()[1:],
-            file,
-            self.color_dict["YELLOW"],
-        )
+        text = self.format_usage()
+        self._print_message(text[:1].upper() + text[1:], file, "YELLOW")
 
     def print_help(self, file=None) -> None:
         """Colorize help message."""
         if file is None:
             file = sys.stdout
-        self._print_message(
-            self.format_help()[0].upper() + self.format_help()[1:],
-            file,
-            self.color_dict["BLUE"],
-        )
+        text = self.format_help()
+        self._print_message(text[:1].upper() + text[1:], file, "BLUE")
 
     def _print_message(self, message, file=None, color=None) -> None:
         if message:
             if file is None:
                 file = sys.stderr
-            # Print messages in bold, colored text if color is given.
-            if color is None:
+            # Print messages in bold, colored text if color name is given.
+            if color is not None:
+                pre, post = self._ansi[color]
+                message = f"{pre}{message.strip()}{post}"
+            # Emit the whole message with a single write(2) when possible
+            try:
+                fd = file.fileno()
+            except (AttributeError, io.UnsupportedOperation):
                 file.write(message)
             else:
-                # \x1b[ is the ANSI Control Sequence Introducer (CSI)
-                file.write("\x1b[" + color + "m" + message.strip() + "\x1b[0m\n")
+                file.flush()
+                buf = memoryview(message.encode())
+                # os.write may write only part of the buffer (e.g. to a pipe)
+                while buf:
+                    buf = buf[os.write(fd, buf) :]
 
     def exit(self, status=0, message=None) -> NoReturn:
         """Exit gracefully after printing message."""
         if message:
-            self._print_message(message, sys.stderr, self.color_dict["RED"])
+            self._print_message(message, sys.stderr, "RED")
         sys.exit(status)
 
     def error(self, message) -> NoReturn:
@@ -57,8 +63,11 @@ class ColoredArgParser(argparse.ArgumentParser):
         self.exit(2, "%(prog)s: Error: %(message)s\n" % args)
 
 
-def build_parser() -> argparse.ArgumentParser:
-    """Return an ArgumentParser object of all defined arguments/options."""
+def build_parser(command: str = None) -> argparse.ArgumentParser:
+    """Return an ArgumentParser object of all defined arguments/options.
+
+    If `command` names a known command, only its subparser is built.
+    """
     parser = ColoredArgParser(
         prog="provision",
         description=__doc__,
@@ -91,6 +100,22 @@ def build_parser() -> argparse.ArgumentParser:
     # parser_all = subparsers.add_parser("all", help="run all provisioning processes")
     # parser_all.set_defaults(func=run_all)
 
+    builders = {
+        "apt": _add_apt_parser,
+        "install": _add_install_parser,
+        "github": _add_github_parsers,
+        "github-release": _add_github_parsers,
+    }
+    if command in builders:
+        builders[command](subparsers, common_parser)
+    else:
+        _add_apt_parser(subparsers, common_parser)
+        _add_install_parser(subparsers, common_parser)
+        _add_github_parsers(subparsers, common_parser)
+    return parser
+
+
+def _add_apt_parser(subparsers, common_parser) -> None:
     # Apt
     parser_apt = subparsers.add_parser(
         "apt",
@@ -116,6 +141,14 @@ def build_parser() -> argparse.ArgumentParser:
     )
     parser_apt_install.set_defaults(func=apt.install)
 
+    # Apt list
+    parser_apt_list = apt_subparsers.add_parser(
+        "list",
+        help="list upgradable packages",
+        description=apt.list_upgradable.__doc__,
+    )
+    parser_apt_list.set_defaults(func=apt.list_upgradable)
+
     # Apt update
     parser_apt_update = apt_subparsers.add_parser(
         "update",
@@ -128,6 +161,8 @@ def build_parser() -> argparse.ArgumentParser:
     )
     parser_apt_update.set_defaults(func=apt.update)
 
+
+def _add_install_parser(subparsers, common_parser) -> None:
     # Install
     install_names = install.command_names()
     parser_install = subparsers.add_parser(
@@ -147,8 +182,17 @@ def build_parser() -> argparse.ArgumentParser:
         metavar="PROGRAM",
         nargs="+",
     )
+    parser_install.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="number of programs to install in parallel (default: 1)",
+    )
     parser_install.set_defaults(func=install.main)
 
+
+def _add_github_parsers(subparsers, common_parser) -> None:
     # Github
     parser_github = subparsers.add_parser(
         "github",
@@ -176,5 +220,3 @@ def build_parser() -> argparse.ArgumentParser:
         nargs="?",
     )
     parser_github_release.set_defaults(func=git.github_latest_release)
-
-    return parser
@@ -9,13 +9,8 @@ from provision.logger import get_logger
 # Entry point
 def cli() -> int:
     """Admin script for provisioning software/settings on unix machines."""
-    try:
-        sys.argv[1]
-        cli_args = sys.argv[1:]
-    except IndexError:
-        cli_args = ["--help"]
-    finally:
-        args, extra = build_parser().parse_known_args(cli_args)
+    cli_args = sys.argv[1:] or ["--help"]
+    args, extra = build_parser(cli_args[0]).parse_known_args(cli_args)
 
     if args.debug == 1:
         log_level = logging.INFO
@@ -24,15 +19,16 @@ def cli() -> int:
     else:
         log_level = logging.WARNING
 
-    LOG = get_logger(log_name=__name__, log_level=log_level)
+    # Configure the package logger here rather than at import time
+    get_logger(log_name="provision", log_level=log_level)
+    LOG = logging.getLogger(__name__)
     LOG.info("Logging level: %s", LOG.getEffectiveLevel())
-    LOG.info("Argument input: %s", repr(cli_args))
-    LOG.info("Argparse output: %s", repr(args))
+    LOG.info("Argument input: %r", cli_args)
+    LOG.info("Argparse output: %r", args)
 
-    try:
-        args.func(args)
-    except AttributeError as e:
-        LOG.error(
-            "No function is associated with command input: %r\nError text:%s", args, e
-        )
+    func = getattr(args, "func", None)
+    if func is None:
+        LOG.error("No function is associated with command input: %r", args)
+        return 1
+    func(args)
     return 0
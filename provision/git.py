@@ -1,13 +1,33 @@
 """Handle interactions with github."""
+import functools
 import logging
 import os
+import shlex
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-from github import Github
-from provision.utils import chdir, run
+from provision.utils import run
 
 LOG = logging.getLogger(__name__)
+HOME = os.path.expanduser("~")
+
+REPOS_QUERY = """
+query($cursor: String) {
+  viewer {
+    repositories(
+      first: 100
+      after: $cursor
+      ownerAffiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER]
+    ) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        sshUrl
+        ignore: object(expression: "HEAD:.provision_ignore") { oid }
+      }
+    }
+  }
+}
+"""
 
 
 def git_clone(repo: str, dest_path: str = "", args: list = ["--recursive"]) -> None:
@@ -18,18 +38,22 @@ def git_clone(repo: str, dest_path: str = "", args: list = ["--recursive"]) -> N
     if not repo[0:4] in ("git@", "http"):
         # Assume it's my repo
         repo = f"git@github.com:comfortablynick/{repo}.git"
-    if dest_path is not None:
+    # Copy so the shared default list isn't mutated between calls
+    args = list(args)
+    if dest_path:
         args.append(os.path.expanduser(dest_path))
     cmd = ["git", "clone", repo, *args]
-    LOG.debug("Cmd: %s", " ".join(cmd))
-    with chdir(os.path.expanduser("~/git")):
-        run(cmd)
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug("Cmd: %s", " ".join(cmd))
+    # Pass cwd instead of using `chdir` so clones can run in threads
+    run(cmd, cwd=f"{HOME}/git")
     return
 
 
+@functools.lru_cache(maxsize=1)
 def github_token() -> str:
     """Retrieve secret access token from disk."""
-    file = os.path.expanduser("~/.github_token")
+    file = f"{HOME}/.github_token"
     token = ""
     try:
         with open(file, "r") as f:
@@ -43,24 +67,70 @@ def github_token() -> str:
 
 def clone_git_repos(args) -> None:
     """Clone repos from GitHub."""
+    from github import Github
+
     token = github_token()
     LOG.info("GitHub token found: %s", token)
     if token == "":
         return
     g = Github(token)
-    for repo in g.get_user().get_repos():
-        root_files = [content.name for content in repo.get_contents(".")]
-        if ".provision_ignore" not in root_files:
-            git_clone(repo.ssh_url)
+    # Check every repo for `.provision_ignore` with one GraphQL request per page
+    # instead of one REST request per repo
+    requester = g._Github__requester
+    urls = []
+    cursor = None
+    while True:
+        _, data = requester.requestJsonAndCheck(
+            "POST",
+            "/graphql",
+            input={"query": REPOS_QUERY, "variables": {"cursor": cursor}},
+        )
+        if data.get("errors"):
+            LOG.error("GitHub GraphQL query failed: %s", data["errors"])
+            return
+        repos = data["data"]["viewer"]["repositories"]
+        urls += [node["sshUrl"] for node in repos["nodes"] if node["ignore"] is None]
+        if not repos["pageInfo"]["hasNextPage"]:
+            break
+        cursor = repos["pageInfo"]["endCursor"]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(git_clone, urls))
 
 
-def git_latest_tag() -> str:
-    """Return first tag after reverse sort of available tags."""
-    return run("git describe --tags --abbrev=0", capture_output=True).stdout.strip("\n")
+def git_latest_remote_tag(url: str) -> str:
+    """Return highest version tag of remote repo without cloning it."""
+    cmd = run(
+        ["git", "ls-remote", "--tags", "--refs", "--sort=-v:refname", url],
+        capture_output=True,
+    )
+    for line in cmd.stdout.splitlines():
+        return line.split("refs/tags/", 1)[1]
+    return ""
+
+
+def git_clone_cmd(url: str, dest: str, tag: str = None) -> str:
+    """Return shell command to shallow clone `url` (at `tag`, if given) to `dest`.
+
+    If `dest` already holds a clone, it is fetched and reset instead.
+    """
+    cmd = ["git", "clone", "--depth=1", "--single-branch"]
+    if tag:
+        cmd += ["--branch", tag]
+    clone = " ".join(shlex.quote(arg) for arg in [*cmd, url, dest])
+    ref = shlex.quote(f"refs/tags/{tag}" if tag else "HEAD")
+    git = f"git -C {shlex.quote(dest)}"
+    update = (
+        f"{git} fetch --depth=1 {shlex.quote(url)} {ref}"
+        f" && {git} reset --hard FETCH_HEAD && {git} clean -fdx"
+    )
+    return f"if [ -d {shlex.quote(dest)}/.git ]; then {update}; else {clone}; fi"
 
 
 def github_latest_release(args) -> int:
     """Get latest release binary."""
+    import requests
+    from github import Github
+
     token = github_token()
     if token == "":
         LOG.error("No GitHub token found!")
@@ -97,11 +167,11 @@ def github_latest_release(args) -> int:
         else:
             break
     print(f"You chose to download {file.name}")
-    r = requests.get(file.browser_download_url, stream=True)
-    LOG.debug("Request response: %s", r.status_code)
     dest_path = os.path.join(os.path.expanduser(args.dest), file.name)
     print(f"Downloading to {dest_path}...")
-    with open(dest_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=128):
-            f.write(chunk)
+    with requests.get(file.browser_download_url, stream=True) as r:
+        LOG.debug("Request response: %s", r.status_code)
+        r.raw.decode_content = True
+        with open(dest_path, "wb") as f:
+            shutil.copyfileobj(r.raw, f, length=1024 * 1024)
     return 0
@@ -1,62 +1,25 @@
 """Download, (build), and install programs."""
+import copy
 import logging
+import os
+import shlex
 import shutil
 import socket
-from typing import List, NoReturn
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
 
-from provision import apt, logger
-from provision.git import git_latest_tag
-from provision.utils import chdir, mkdir_p, rmtree, run
+from provision import apt
+from provision.git import git_clone_cmd, git_latest_remote_tag
+from provision.utils import make_cmd, rmtree_parallel, run, run_script
 
-LOG = logger.get_logger(__name__, logging.DEBUG)
+LOG = logging.getLogger(__name__)
+# Sources are kept here between runs, so re-installs fetch instead of cloning
+SRC_DIR = os.path.expanduser("~/.cache/provision")
 
-
-def install(args) -> int:
-    """Install software, building from source if needed."""
-    LOG.info("Install called for: %s", ", ".join(args.install))
-
-    for item in args.install:
-        func_name = f"install_{item}"
-        try:
-            LOG.debug("Calling '%s'", func_name)
-            globals()[func_name](args)
-        except KeyError:
-            LOG.error("Function '%s' does not exist!", func_name)
-            return 1
-    return 0
-
-
-def install_ctags(args) -> int:
-    """Download, build, and install universal ctags."""
-    if shutil.which("ctags") and not args.force:
-        LOG.warning("ctags already exists. Skipping install!")
-        return 1
-    ctags_tmp = "/tmp/ctags"
-    rmtree(ctags_tmp, ignore_errors=True)
-    run(f"git clone https://github.com/universal-ctags/ctags.git {ctags_tmp}")
-
-    with chdir(ctags_tmp):
-        run("./autogen.sh")
-        if run("./configure").returncode == 0:
-            LOG.debug("ctags build configured. Running `make`")
-            run("make")
-        else:
-            LOG.error("ctags build configure failed!")
-            return 1
-        LOG.debug("Installing ctags...")
-        run("sudo make install")
-    LOG.debug("Cleaning up temp directories...")
-    rmtree(ctags_tmp, ignore_errors=True)
-    return 0
-
-
-def install_lpass(args) -> int:
-    """Download, build, and install lastpass CLI."""
-    prog_name = "lpass"
-    if shutil.which(prog_name) and not args.force:
-        LOG.warning("%s already exists. Skipping install!", prog_name)
-        return 1
-    pkgs = [
+# Apt packages needed to build each program
+DEPS = {
+    "ctags": ["ccache"],
+    "lpass": [
         "bash-completion",
         "build-essential",
         "cmake",
@@ -71,97 +34,26 @@ def install_lpass(args) -> int:
         "asciidoc",
         "xsltproc",
         "xclip",
-    ]
-    apt.install(args, pkgs=pkgs)
-    tmp_dir = f"/tmp/{prog_name}"
-    rmtree(tmp_dir, ignore_errors=True)
-    run(f"git clone https://github.com/lastpass/lastpass-cli.git {tmp_dir}")
-
-    with chdir(tmp_dir):
-        run("make")
-        LOG.debug("Installing %s...", prog_name)
-        run("sudo make install")
-        run("sudo make install-doc")
-    LOG.debug("Cleaning up temp directories...")
-    rmtree(tmp_dir, ignore_errors=True)
-    return 0
-
-
-def install_fish(args) -> int:
-    """Download, build, and install the Friendly Interactive SHell."""
-    if shutil.which("fish") and not args.force:
-        LOG.warning("fish already exists. Skipping install!")
-        return 1
-    pkgs = [
+    ],
+    "fish": [
         "build-essential",
         "ncurses-dev",
         "libncurses5-dev",
         "gettext",
         "autoconf",
         "doxygen",
-    ]
-    apt.install(args, pkgs=pkgs)
-    fish_tmp = "/tmp/fish"
-    rmtree(fish_tmp, ignore_errors=True)
-    run(f"git clone https://github.com/fish-shell/fish-shell.git {fish_tmp}")
-
-    with chdir(fish_tmp):
-        run("mkdir build")
-
-        with chdir("./build"):
-            run("cmake ..")
-            run("make")
-            LOG.debug("Installing fish...")
-            run("sudo make install")
-    LOG.debug("Cleaning up temp directories...")
-    rmtree(fish_tmp, ignore_errors=True)
-    return 0
-
-
-def install_tmux(args) -> int:
-    """Download, build, and install tmux terminal multiplexer."""
-    if shutil.which("tmux") and not args.force:
-        LOG.warning("tmux already exists. Skipping install!")
-        return 1
-    pkgs = [
+        "ccache",
+    ],
+    "tmux": [
         "git",
         "automake",
         "build-essential",
         "pkg-config",
         "libevent-dev",
         "libncurses5-dev",
-    ]
-    apt.install(args, pkgs)
-    tmux_tmp = "/tmp/tmux"
-    rmtree(tmux_tmp, ignore_errors=True)
-    run(f"git clone https://github.com/tmux/tmux.git {tmux_tmp}")
-
-    with chdir(tmux_tmp):
-        tag = run("git describe --tags --abbrev=0", capture_output=True).stdout.strip(
-            "\n"
-        )
-        LOG.info("Checking out most recent tmux release: %s", tag)
-        run(f"git checkout {tag}")
-        run("sh autogen.sh")
-        if run("./configure").returncode == 0:
-            LOG.debug("tmux build configured. Running `make`")
-            run("make")
-        else:
-            LOG.error("tmux build configure failed!")
-            return 1
-        LOG.debug("Installing tmux...")
-        run("sudo make install")
-    LOG.debug("Cleaning up temp directories...")
-    rmtree(tmux_tmp, ignore_errors=True)
-    return 0
-
-
-def install_mosh(args) -> int:
-    """Download, build, and install mobile shell."""
-    if shutil.which("mosh") and not args.force:
-        LOG.warning("mosh already exists. Skipping install!")
-        return 1
-    pkgs = [
+        "ccache",
+    ],
+    "mosh": [
         "protobuf-compiler",
         "libprotobuf-dev",
         "libutempter-dev",
@@ -170,33 +62,9 @@ def install_mosh(args) -> int:
         "libssl-dev",
         "pkg-config",
         "autoconf",
-    ]
-    apt.install(args, pkgs)
-    mosh_tmp = "/tmp/mosh"
-    rmtree(mosh_tmp, ignore_errors=True)
-    run(f"git clone https://github.com/keithw/mosh.git {mosh_tmp}")
-
-    with chdir(mosh_tmp):
-        run("sh autogen.sh")
-        if run("./configure").returncode == 0:
-            LOG.debug("mosh build configured. Running `make`")
-            run("make")
-        else:
-            LOG.error("mosh build configure failed!")
-        LOG.debug("Installing mosh...")
-        run("sudo make install")
-    LOG.debug("Cleaning up temp directories...")
-    rmtree(mosh_tmp, ignore_errors=True)
-    return 0
-
-
-def install_neovim(args) -> int:
-    """Download, build, and install Neovim."""
-    prog_name = "nvim"
-    if shutil.which(prog_name) and not args.force:
-        LOG.warning("%s already exists. Skipping install!", prog_name)
-        return 1
-    pkgs = [
+        "ccache",
+    ],
+    "neovim": [
         "gperf",
         "libluajit-5.1-dev",
         "libunibilium-dev",
@@ -204,28 +72,206 @@ def install_neovim(args) -> int:
         "libtermkey-dev",
         "libvterm-dev",
         "libjemalloc-dev",
-    ]
-    apt.install(args, pkgs=pkgs)
-    tmp_dir = f"/tmp/{prog_name}"
-    rmtree(tmp_dir, ignore_errors=True)
-    run(f"git clone https://github.com/neovim/neovim.git {tmp_dir}")
-
-    LOG.info("Building dependencies...")
-    deps_dir = f"{tmp_dir}/.deps"
-    mkdir_p(deps_dir)
-    with chdir(deps_dir):
-        cmake = run("cmake ../third-party", capture_output=True)
-        if cmake.returncode == 0:
-            run("make")
-    LOG.info("Building %s...", prog_name)
-    with chdir(tmp_dir):
-        run("make distclean")
-        run("make CMAKE_BUILD_TYPE=RelWithDebInfo")
-        LOG.info("Installing %s...", prog_name)
-        run("sudo make install")
-    LOG.debug("Cleaning up temp directories...")
-    rmtree(tmp_dir, ignore_errors=True)
-    return 0
+        "ccache",
+    ],
+    "vim": [
+        "libncurses5-dev",
+        "libgnome2-dev",
+        "libgnomeui-dev",
+        "libgtk2.0-dev",
+        "libatk1.0-dev",
+        "libbonoboui2-dev",
+        "libcairo2-dev",
+        "libx11-dev",
+        "libxpm-dev",
+        "libxt-dev",
+        "python-dev",
+        "python3-dev",
+        "lua5.1",
+        "liblua5.1-dev",
+        "libperl-dev",
+    ],
+    "nnn": ["pkg-config", "libncursesw5-dev"],
+}
+
+
+_WHICH_CACHE: Dict[str, Optional[str]] = {}
+
+
+def which(name: str) -> Optional[str]:
+    """Return `shutil.which(name)`, caching the result."""
+    if name not in _WHICH_CACHE:
+        _WHICH_CACHE[name] = shutil.which(name)
+    return _WHICH_CACHE[name]
+
+
+# Binary each program installs, where it differs from the program name
+BINARIES = {"neovim": "nvim", "todo": "todo.sh"}
+
+
+def _needs_install(prog: str, args) -> bool:
+    """Check if `prog` should be built, logging why not."""
+    binary = BINARIES.get(prog, prog)
+    if which(binary) and not args.force:
+        LOG.warning("%s already exists. Skipping install!", binary)
+        return False
+    if prog == "vim" and _python_config_dir() is None:
+        LOG.error("Need python3 directory for this host!")
+        return False
+    return True
+
+
+def _install_deps(prog: str, args) -> None:
+    """Install apt deps for `prog`, unless `main` already installed them."""
+    if not getattr(args, "deps_installed", False):
+        apt.install(args, pkgs=DEPS[prog], recommends=False)
+
+
+def _make(args) -> str:
+    """Return `make` command, splitting the cores across parallel installs."""
+    return make_cmd(getattr(args, "build_jobs", 1))
+
+
+def install_ctags(args) -> int:
+    """Download, build, and install universal ctags."""
+    if not _needs_install("ctags", args):
+        return 1
+    _install_deps("ctags", args)
+    ctags_src = f"{SRC_DIR}/ctags"
+    build = run_script(
+        [
+            git_clone_cmd("https://github.com/universal-ctags/ctags.git", ctags_src),
+            f"cd {shlex.quote(ctags_src)}",
+            "./autogen.sh",
+            "./configure",
+            _make(args),
+            "sudo make install",
+        ],
+        with_ccache=True,
+    )
+    if build.returncode != 0:
+        LOG.error("ctags build failed!")
+    return build.returncode
+
+
+def install_lpass(args) -> int:
+    """Download, build, and install lastpass CLI."""
+    prog_name = "lpass"
+    if not _needs_install("lpass", args):
+        return 1
+    _install_deps("lpass", args)
+    src_dir = f"{SRC_DIR}/{prog_name}"
+    build = run_script(
+        [
+            git_clone_cmd("https://github.com/lastpass/lastpass-cli.git", src_dir),
+            f"cd {shlex.quote(src_dir)}",
+            _make(args),
+            "sudo make install",
+            "sudo make install-doc",
+        ]
+    )
+    if build.returncode != 0:
+        LOG.error("%s build failed!", prog_name)
+    return build.returncode
+
+
+def install_fish(args) -> int:
+    """Download, build, and install the Friendly Interactive SHell."""
+    if not _needs_install("fish", args):
+        return 1
+    _install_deps("fish", args)
+    fish_src = f"{SRC_DIR}/fish"
+    build = run_script(
+        [
+            git_clone_cmd("https://github.com/fish-shell/fish-shell.git", fish_src),
+            f"mkdir {shlex.quote(fish_src)}/build",
+            f"cd {shlex.quote(fish_src)}/build",
+            "cmake -DCMAKE_BUILD_TYPE=Release ..",
+            _make(args),
+            "sudo make install",
+        ],
+        with_ccache=True,
+    )
+    if build.returncode != 0:
+        LOG.error("fish build failed!")
+    return build.returncode
+
+
+def install_tmux(args) -> int:
+    """Download, build, and install tmux terminal multiplexer."""
+    if not _needs_install("tmux", args):
+        return 1
+    _install_deps("tmux", args)
+    tmux_src = f"{SRC_DIR}/tmux"
+    url = "https://github.com/tmux/tmux.git"
+    tag = git_latest_remote_tag(url)
+    if not tag:
+        LOG.error("Could not find latest tmux release. Aborting install!")
+        return 1
+    LOG.info("Checking out most recent tmux release: %s", tag)
+    build = run_script(
+        [
+            git_clone_cmd(url, tmux_src, tag=tag),
+            f"cd {shlex.quote(tmux_src)}",
+            "sh autogen.sh",
+            "./configure",
+            _make(args),
+            "sudo make install",
+        ],
+        with_ccache=True,
+    )
+    if build.returncode != 0:
+        LOG.error("tmux build failed!")
+    return build.returncode
+
+
+def install_mosh(args) -> int:
+    """Download, build, and install mobile shell."""
+    if not _needs_install("mosh", args):
+        return 1
+    _install_deps("mosh", args)
+    mosh_src = f"{SRC_DIR}/mosh"
+    build = run_script(
+        [
+            git_clone_cmd("https://github.com/keithw/mosh.git", mosh_src),
+            f"cd {shlex.quote(mosh_src)}",
+            "sh autogen.sh",
+            "./configure",
+            _make(args),
+            "sudo make install",
+        ],
+        with_ccache=True,
+    )
+    if build.returncode != 0:
+        LOG.error("mosh build failed!")
+    return build.returncode
+
+
+def install_neovim(args) -> int:
+    """Download, build, and install Neovim."""
+    prog_name = "nvim"
+    if not _needs_install("neovim", args):
+        return 1
+    _install_deps("neovim", args)
+    src_dir = f"{SRC_DIR}/{prog_name}"
+    LOG.info("Building dependencies and %s...", prog_name)
+    build = run_script(
+        [
+            git_clone_cmd("https://github.com/neovim/neovim.git", src_dir),
+            f"mkdir -p {shlex.quote(src_dir)}/.deps",
+            f"cd {shlex.quote(src_dir)}/.deps",
+            "cmake ../third-party",
+            _make(args),
+            "cd ..",
+            "make distclean",
+            f"{_make(args)} CMAKE_BUILD_TYPE=RelWithDebInfo",
+            "sudo make install",
+        ],
+        with_ccache=True,
+    )
+    if build.returncode != 0:
+        LOG.error("%s build failed!", prog_name)
+    return build.returncode
 
 
 """
@@ -250,159 +296,203 @@ esac
 """
 
 
+PY_CONFIG_DIRS = dict(
+    io="/usr/local/lib/python3.7/config-3.7m-x86_64-linux-gnu",
+    titan="/home/pi/.pyenv/versions/3.7.2/lib/python3.7/config-3.7m-arm-linux-gnueabihf",
+    jupiter="/home/nick/.pyenv/versions/3.7.2/lib/python3.7/config-3.7m-x86_64-linux-gnu",
+)
+
+
+def _python_config_dir() -> Optional[str]:
+    """Return python3 config dir to build vim against on this host."""
+    return PY_CONFIG_DIRS.get(socket.gethostname())
+
+
 def install_vim(args) -> int:
     """Download, build, and install Vim."""
     prog_name = "vim"
-    if shutil.which(prog_name) and not args.force:
-        LOG.warning("%s already exists. Skipping install!", prog_name)
+    if not _needs_install("vim", args):
         return 1
-    pkgs = [
-        "libncurses5-dev",
-        "libgnome2-dev",
-        "libgnomeui-dev",
-        "libgtk2.0-dev",
-        "libatk1.0-dev",
-        "libbonoboui2-dev",
-        "libcairo2-dev",
-        "libx11-dev",
-        "libxpm-dev",
-        "libxt-dev",
-        "python-dev",
-        "python3-dev",
-        "lua5.1",
-        "liblua5.1-dev",
-        "libperl-dev",
-    ]
-    apt.install(args, pkgs=pkgs)
-    tmp_dir = f"/tmp/{prog_name}"
-    rmtree(tmp_dir, ignore_errors=True)
-    run(f"git clone https://github.com/vim/vim.git {tmp_dir}")
+    py_dir = _python_config_dir()
+    LOG.debug("Python directory for this host: %s", py_dir)
+    _install_deps("vim", args)
+    src_dir = f"{SRC_DIR}/{prog_name}"
 
     LOG.info("Building %s...", prog_name)
-    py_dirs = dict(
-        io="/usr/local/lib/python3.7/config-3.7m-x86_64-linux-gnu",
-        titan="/home/pi/.pyenv/versions/3.7.2/lib/python3.7/config-3.7m-arm-linux-gnueabihf",
-        jupiter="/home/nick/.pyenv/versions/3.7.2/lib/python3.7/config-3.7m-x86_64-linux-gnu",
+    configure = [
+        "./configure",
+        "--with-features=huge",
+        "--enable-gui=no",
+        "--enable-multibyte",
+        "--enable-rubyinterp=yes",
+        "--enable-python3interp=yes",
+        "--with-python3-config-dir={}".format(py_dir),
+        "--enable-perlinterp=yes",
+        "--enable-luainterp=yes",
+        "--enable-cscope",
+        "--prefix=/usr/local",
+    ]
+    build = run_script(
+        [
+            git_clone_cmd("https://github.com/vim/vim.git", src_dir),
+            f"cd {shlex.quote(src_dir)}",
+            " ".join(map(shlex.quote, configure)),
+            f"{_make(args)} VIMRUNTIMEDIR=/usr/local/share/vim/vim81",
+            "sudo make install",
+        ]
     )
-    try:
-        py_dir = py_dirs[socket.gethostname()]
-    except KeyError:
-        LOG.error("Need python3 directory for this host!")
-        return 1
-    LOG.debug("Python directory for this host: %s", py_dir)
-
-    with chdir(tmp_dir):
-        LOG.info("Configuring %s...", prog_name)
-        run(
-            [
-                "./configure",
-                "--with-features=huge",
-                "--enable-gui=no",
-                "--enable-multibyte",
-                "--enable-rubyinterp=yes",
-                "--enable-python3interp=yes",
-                "--with-python3-config-dir={}".format(py_dir),
-                "--enable-perlinterp=yes",
-                "--enable-luainterp=yes",
-                "--enable-cscope",
-                "--prefix=/usr/local",
-            ]
-        )
-        run("make VIMRUNTIMEDIR=/usr/local/share/vim/vim81")
-        LOG.info("Installing %s...", prog_name)
-        run("sudo make install")
-    LOG.debug("Cleaning up temp directories...")
-    rmtree(tmp_dir, ignore_errors=True)
-    return 0
+    if build.returncode != 0:
+        LOG.error("%s build failed!", prog_name)
+    return build.returncode
 
 
 def install_nnn(args) -> int:
     """Download, install and build nnn file manager."""
-    if shutil.which("nnn") and not args.force:
-        LOG.warning("nnn already exists. Skipping install!")
+    if not _needs_install("nnn", args):
+        return 1
+    _install_deps("nnn", args)
+    nnn_src = f"{SRC_DIR}/nnn"
+    url = "https://github.com/jarun/nnn.git"
+    tag = git_latest_remote_tag(url)
+    if not tag:
+        LOG.error("Could not find latest nnn release. Aborting install!")
         return 1
-    pkgs = ["pkg-config", "libncursesw5-dev"]
-    apt.install(args, pkgs)
-    nnn_tmp = "/tmp/nnn"
-    rmtree(nnn_tmp, ignore_errors=True)
-    run(f"git clone https://github.com/jarun/nnn.git {nnn_tmp}")
-
-    with chdir(nnn_tmp):
-        tag = git_latest_tag()
-        LOG.info("Checking out most recent nnn release: %s", tag)
-        if run(f"git checkout {tag}").returncode == 0:
-            run("make")
-            LOG.debug("Installing nnn...")
-            run("sudo make install")
-        else:
-            LOG.error("Checkout for latest version of `nnn` failed. Aborting install!")
-            LOG.debug("Cleaning up temp directories...")
-    rmtree(nnn_tmp, ignore_errors=True)
-    return 0
+    LOG.info("Checking out most recent nnn release: %s", tag)
+    build = run_script(
+        [
+            git_clone_cmd(url, nnn_src, tag=tag),
+            f"cd {shlex.quote(nnn_src)}",
+            _make(args),
+            "sudo make install",
+        ]
+    )
+    if build.returncode != 0:
+        LOG.error("nnn build failed!")
+    return build.returncode
 
 
 def install_todo(args) -> int:
     """Download and install todo.txt cli."""
-    if shutil.which("todo.sh") and not args.force:
-        LOG.warning("todo.sh already exists. Skipping install!")
+    if not _needs_install("todo", args):
         return 1
 
-    todo_tmp = "/tmp/todo"
-    rmtree(todo_tmp, ignore_errors=True)
-    run(f"git clone https://github.com/todotxt/todo.txt-cli.git {todo_tmp}")
-
-    with chdir(todo_tmp):
-        run("make")
-        install = run("sudo make install", capture_output=True)
-    rmtree(todo_tmp)
+    todo_src = f"{SRC_DIR}/todo"
+    install = run_script(
+        [
+            git_clone_cmd("https://github.com/todotxt/todo.txt-cli.git", todo_src),
+            f"cd {shlex.quote(todo_src)}",
+            _make(args),
+            "sudo make install",
+        ]
+    )
     return install.returncode
 
 
 def install_vcprompt(args) -> int:
     """Download and install vcprompt C utility for git status."""
-    if shutil.which("vcprompt") and not args.force:
-        LOG.warning("vcprompt already exists. Skipping install!")
+    if not _needs_install("vcprompt", args):
         return 1
 
     vcp_tmp = "/tmp/vcprompt"
-    rmtree(vcp_tmp, ignore_errors=True)
-    run(f"hg clone https://bitbucket.org/gward/vcprompt {vcp_tmp}")
-
-    with chdir(vcp_tmp):
-        run("autoconf")
-        run("./configure")
-        run("make")
-        install = run("sudo make install")
-    rmtree(vcp_tmp)
+    rmtree_parallel(vcp_tmp, ignore_errors=True)
+    install = run_script(
+        [
+            f"hg clone https://bitbucket.org/gward/vcprompt {shlex.quote(vcp_tmp)}",
+            f"cd {shlex.quote(vcp_tmp)}",
+            "autoconf",
+            "./configure",
+            _make(args),
+            "sudo make install",
+        ]
+    )
+    rmtree_parallel(vcp_tmp, ignore_errors=True)
     return install.returncode
 
 
 def install_htop(args) -> int:
     """Download and install htop process viewer."""
-    if shutil.which("htop") and not args.force:
-        LOG.warning("htop already exists. Skipping install!")
+    if not _needs_install("htop", args):
         return 1
 
-    tmp = "/tmp/htop"
-    rmtree(tmp, ignore_errors=True)
-    run(f"git clone https://github.com/hishamhm/htop.git {tmp}")
-
-    with chdir(tmp):
-        run("./autogen.sh")
-        run("./configure")
-        run("make")
-        install = run("sudo make install")
-    rmtree(tmp)
+    src = f"{SRC_DIR}/htop"
+    install = run_script(
+        [
+            git_clone_cmd("https://github.com/hishamhm/htop.git", src),
+            f"cd {shlex.quote(src)}",
+            "./autogen.sh",
+            "./configure",
+            _make(args),
+            "sudo make install",
+        ]
+    )
     return install.returncode
 
 
-def command_names() -> List[str]:
-    """Return globals of this script."""
-    return [d.split("_")[1] for d in globals().keys() if d.startswith("install_")]
+# Map program name to its installer, e.g. "tmux" -> install_tmux
+INSTALLERS = {
+    name[len("install_") :]: func
+    for name, func in globals().items()
+    if name.startswith("install_") and callable(func)
+}
+
+
+_COMMAND_NAMES = tuple(INSTALLERS)
+
+
+def command_names() -> Tuple[str, ...]:
+    """Return names of programs that can be installed."""
+    return _COMMAND_NAMES
 
 
-def main(args) -> NoReturn:
-    """Direct `args` to correct function."""
-    for prog in args.install:
-        prog_name = f"install_{prog}"
-        globals()[prog_name](args)
+def _install_one(prog: str, args) -> int:
+    func = INSTALLERS.get(prog)
+    if func is None:
+        LOG.error("Function 'install_%s' does not exist!", prog)
+        return 1
+    LOG.debug("Calling 'install_%s'", prog)
+    result = func(args)
+    if result == 0:
+        # A new program is on PATH now
+        _WHICH_CACHE.clear()
+    return result
+
+
+def main(args) -> int:
+    """Install software, building from source if needed."""
+    if LOG.isEnabledFor(logging.INFO):
+        LOG.info("Install called for: %s", ", ".join(args.install))
+    # Run skip checks first so deps are only installed for programs we build;
+    # unknown names are kept so `_install_one` reports them
+    progs = [p for p in args.install if p not in INSTALLERS or _needs_install(p, args)]
+    returncode = 0 if len(progs) == len(args.install) else 1
+    if not progs:
+        return returncode
+    # Install deps for every program with one apt call (one dpkg transaction)
+    # and tell the installers to skip their own apt step
+    pkgs = set().union(*(DEPS.get(prog, []) for prog in progs))
+    if pkgs:
+        apt.install(args, pkgs=sorted(pkgs), recommends=False)
+    jobs = min(getattr(args, "jobs", None) or 1, len(progs))
+    args = copy.copy(args)
+    args.deps_installed = True
+    # Each build runs `make` on its share of the cores, so N parallel builds
+    # don't run N times as many compilers as there are cores
+    args.build_jobs = jobs
+    if jobs <= 1:
+        for prog in progs:
+            # Keep the first failure; signal deaths return negative codes
+            result = _install_one(prog, args)
+            returncode = returncode or result
+        return returncode
+    LOG.info("Installing %d programs with %d jobs", len(progs), jobs)
+    # Prime sudo so parallel builds don't all prompt for a password
+    run(["sudo", "-v"])
+    # Builds `cd` inside their own shell, so threads can share our cwd
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_install_one, prog, args): prog for prog in progs}
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                LOG.warning("Install of %s returned %d", futures[future], result)
+            returncode = returncode or result
+    return returncode
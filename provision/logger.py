@@ -1,8 +1,6 @@
 """Colored logger."""
 import logging
 
-import coloredlogs
-
 
 def get_logger(log_name: str, log_level: int = logging.WARNING) -> logging.Logger:
     """Define defaults for color logger.
@@ -10,6 +8,8 @@ def get_logger(log_name: str, log_level: int = logging.WARNING) -> logging.Logge
     Supported styles and colors can be found by running the
     ``humanfriendly --demo`` command.
     """
+    import coloredlogs
+
     log_fmt = "%(levelname)s:%(name)s:%(funcName)s: %(message)s"
     field_styles = dict(
         asctime=dict(color="green"),
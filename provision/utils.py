@@ -6,74 +6,97 @@ import shutil
 import stat
 import subprocess
 import warnings
-from contextlib import contextmanager
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from shlex import split
-from typing import Generator
+from typing import Dict, List, Union
 
 LOG = logging.getLogger(__name__)
 
 
-def run(cmd, encoding="utf-8", *args, **kwargs):
+def make_cmd(jobs: int = 1) -> str:
+    """Return `make` command sharing the cores among `jobs` parallel builds."""
+    return f"make -j{max(1, (os.cpu_count() or 2) // jobs)}"
+
+
+# Build with all cores; `make install` steps are left serial
+MAKE = make_cmd()
+_CMD_CACHE: Dict[str, List[str]] = {}
+
+
+def run(cmd, encoding="utf-8", *args, quiet=False, with_ccache=False, **kwargs):
     """Run subprocess command
 
-    A string command will be split into a list for subprocess.run()."""
+    A string command will be split into a list for subprocess.run(); pass a
+    list to skip the split.
+    If `quiet`, stdout is discarded instead of written to the terminal.
+    If `with_ccache` and ccache is installed, C/C++ compilers are wrapped by it."""
     if not isinstance(cmd, list):
-        cmd = split(cmd)
+        # Slow path: tokenize string commands, caching repeated ones
+        if cmd not in _CMD_CACHE:
+            _CMD_CACHE[cmd] = split(cmd)
+        cmd = list(_CMD_CACHE[cmd])
+    if quiet:
+        kwargs["stdout"] = subprocess.DEVNULL
+    if with_ccache and shutil.which("ccache"):
+        kwargs["env"] = {
+            **(kwargs.get("env") or os.environ),
+            "CC": "ccache gcc",
+            "CXX": "ccache g++",
+            "CCACHE_DIR": os.path.expanduser("~/.cache/provision-ccache"),
+        }
     return subprocess.run(cmd, *args, **kwargs, encoding=encoding)
 
 
-def mkdir_p(newdir: str) -> None:
-    """Make new directory if it doesn't exist.
+def run_script(lines: List[str], **kwargs):
+    """Run shell commands in a single bash process.
 
-    Emulates `mkdir -p`
-        - if it already exists, silently complete
-        - if regular file in the way, raise an exception
-        - if parent directories do not exist, make them as well
-        From: Pipenv (http://bit.ly/2SLxRwL)
-    """
-    if os.path.isdir(newdir):
-        LOG.debug("%s already exists", newdir)
-        pass
-    elif os.path.isfile(newdir):
-        raise OSError(
-            f"a file with the same name as the desired dir, '{newdir}', already exists."
-        )
-
-    else:
-        head, tail = os.path.split(newdir)
-        if head and not os.path.isdir(head):
-            mkdir_p(head)
-        if tail:
-            # Even though we've checked that the directory doesn't exist above, it might exist
-            # now if some other process has created it between now and the time we checked it.
-            try:
-                os.mkdir(newdir)
-            except OSError as exn:
-                # If we failed because the directory does exist, that's not a problem -
-                # that's what we were trying to do anyway. Only re-raise the exception
-                # if we failed for some other reason.
-                if exn.errno != errno.EEXIST:
-                    raise
-
-
-def set_write_bit(file_name: str) -> None:
-    """Make file writable."""
-    if isinstance(file_name, str) and not os.path.exists(file_name):
+    Commands are joined with `&&`, so the script stops at the first failure.
+    State such as `cd` carries over between lines."""
+    script = " && ".join(lines)
+    LOG.debug("Script: %s", script)
+    return run(["bash", "-c", script], **kwargs)
+
+
+def set_write_bit(file_name: Union[str, os.PathLike]) -> None:
+    """Make file writable, ignoring files that no longer exist."""
+    try:
+        os.chmod(file_name, stat.S_IWUSR | stat.S_IRUSR)
+    except FileNotFoundError:
         return
-    os.chmod(file_name, stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR)
-    return
 
 
-def rmtree(directory: str, ignore_errors=False):
-    """Remove directory and contents."""
-    LOG.debug("Removing directory tree %s", directory)
-    shutil.rmtree(
-        directory, ignore_errors=ignore_errors, onerror=handle_remove_readonly
-    )
+def rmtree_parallel(directory: str, ignore_errors=False, workers: int = None):
+    """Remove directory and contents, deleting top-level entries in parallel."""
+    LOG.debug("Removing directory tree %s in parallel", directory)
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        if ignore_errors:
+            return
+        raise
+
+    def remove(entry: os.DirEntry) -> None:
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(
+                entry.path, ignore_errors=ignore_errors, onerror=handle_remove_readonly
+            )
+            return
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            if not ignore_errors:
+                raise
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(remove, entries))
+    try:
+        os.rmdir(directory)
+    except OSError:
+        if not ignore_errors:
+            raise
 
 
-def handle_remove_readonly(func, path: str, exc) -> None:
+def handle_remove_readonly(func, path: Union[str, os.PathLike], exc) -> None:
     """Error handler for shutil.rmtree.
 
     Windows source repo folders are read-only by default, so this error handler
@@ -102,34 +125,14 @@ def handle_remove_readonly(func, path: str, exc) -> None:
     raise
 
 
-def is_readonly_path(file_name: str) -> bool:
+def is_readonly_path(file_name: Union[str, os.PathLike]) -> bool:
     """Check if a provided path exists and is readonly.
 
-    Permissions check is `bool(path.stat & stat.S_IREAD)`
-    or `not os.access(path, os.W_OK)`
-    """
-    if os.path.exists(file_name):
-        return bool(os.stat(file_name).st_mode & stat.S_IREAD) or not os.access(
-            file_name, os.W_OK
-        )
-
-    return False
-
-
-@contextmanager
-def chdir(path: str) -> Generator:
-    """Context manager to change working directories.
-
-    Usage:
-        `with chdir(/path/to/execute/cmd/in):`
+    Permissions check is `not (path.stat & stat.S_IWUSR)`, from a single stat
     """
-    if not path:
-        return
-    prev_cwd = Path.cwd().as_posix()
-    if isinstance(path, Path):
-        path = path.as_posix()
-    os.chdir(str(path))
     try:
-        yield
-    finally:
-        os.chdir(prev_cwd)
+        mode = os.stat(file_name).st_mode
+    except FileNotFoundError:
+        return False
+    return not mode & stat.S_IWUSR
+